@@ -111,16 +111,36 @@
 #####
 
 import math
-from cmath import sqrt
-from turtle import st
+# for exact and high precision values of the domino train product
+from fractions import Fraction
+from decimal import Decimal, localcontext
+from functools import lru_cache
+# for calculations over whole arrays of squares at once
+import numpy as np
 # for simple data tables
 from tabulate import tabulate
 # for colors in tables
 from colorama import init, Back, Fore
-# for Hilbert curve calculations
-from hilbertcurve.hilbertcurve import HilbertCurve
-# for Hilbert curve diagrams
-import matplotlib.pyplot as plt
+# for cross-checking and benchmarking the Hilbert curve calculations (optional)
+try:
+    from hilbertcurve.hilbertcurve import HilbertCurve
+except ImportError:
+    HilbertCurve = None
+import random
+import time
+# for saving the counts of a chunked run, so it can be resumed
+import os
+import json
+import hashlib
+from functools import partial
+# for rendering diagrams (and counting chunks) in parallel with the rest of the calculations
+from concurrent.futures import ProcessPoolExecutor
+# for the command-line interface
+import argparse
+import io
+import sys
+import zipfile
+# Matplotlib, for Hilbert curve diagrams, is only imported when they're created (see `get_pyplot()`).
 
 
 #####
@@ -170,6 +190,214 @@ def get_number(square):
     elif condition == 2: return num_2
     else: return den_2
 
+#####
+#### `get_numbers()`
+#
+# > Given an array of squares, find which domino number covers each of them.
+# >
+# > This is the same calculation as `get_number()`, but for a whole (NumPy) array of squares at once.
+#####
+def get_numbers(squares):
+    terms = (squares + 1) // 4 + 1
+    num_1 = (2 * terms - 1) % 7
+    den_1 = num_2 = (2 * terms + (terms - 1) // 7) % 7
+    den_2 = (2 * terms + 1) % 7
+    conditions = (squares + 1) % 4
+    return np.choose(conditions, [num_1, den_1, num_2, den_2])
+
+
+#####
+### Domino Train Product
+#
+# The domino numbers are the numerators and denominators of my Wallis-like domino train product, taken mod 7. The functions below evaluate the product itself (before taking anything mod 7), exactly, for the whole train or any range of terms.
+#
+# Multiplying millions of fractions one after another is slow, because each step multiplies an ever bigger fraction by a small one. Instead, the terms are multiplied pairwise in a binary "product tree", whose levels are cached, so the product over any range of terms combines only a couple of cached sub-products per level. Each sub-product is kept in lowest terms, and fixed size NumPy integers are used for as long as they can't overflow, so this takes seconds even for millions of terms.
+#####
+
+#####
+#### `get_term_fractions()`
+#
+# > Given `term`, find the numerators and denominators of its two fractions (before taking them mod 7, as `get_number()` does).
+# >
+# > This works for a single term or a whole (NumPy) array of terms.
+#####
+def get_term_fractions(term):
+    num_1 = 2 * term - 1
+    den_1 = num_2 = 2 * term + (term - 1) // 7
+    den_2 = 2 * term + 1
+    return [[num_1, den_1], [num_2, den_2]]
+
+# The lowest levels of the tree are the biggest but the cheapest to recompute, so they aren't kept: the tree starts at products of blocks of `2 ** product_tree_leaf_levels` terms, and the few terms at either end of a range are multiplied directly. The tree is also built from `product_tree_block_size` terms at a time, so the products of single terms never all exist at once.
+product_tree_leaf_levels = 6
+product_tree_block_size = 2 ** 16
+# Ranges of fewer terms than this (a few blocks) are quicker to multiply directly than to walk a tree for.
+product_tree_min_terms = 4 * 2 ** product_tree_leaf_levels
+# The last product tree built, as the number of terms it covers and its levels, so that any range of terms it covers reuses it. (See `get_covering_product_tree()`.)
+cached_product_tree = [0, None]
+
+#####
+#### `get_term_products()`
+#
+# > Given a first and last term (counting from 1, and including both), list the product of each term's two fractions, as arrays of numerators and of denominators in lowest terms.
+#####
+def get_term_products(first_term, last_term):
+    # Fixed size integers are much faster, but if a term's products could overflow them, use (arbitrary size) Python integers.
+    dtype = np.int64 if (3 * last_term) ** 2 < 2 ** 62 else object
+    terms = np.arange(first_term, last_term + 1, dtype = dtype)
+    [[numerators, denominators], [num_2, den_2]] = get_term_fractions(terms)
+    del terms
+    # multiplied in place, to keep down the number of arrays the size of the range
+    numerators *= num_2
+    denominators *= den_2
+    del num_2, den_2
+    divisors = np.gcd(numerators, denominators)
+    numerators //= divisors
+    denominators //= divisors
+    return numerators, denominators
+
+#####
+#### `get_paired_products()`
+#
+# > Given a level of the product tree, as arrays of numerators and of denominators, find the next level up by multiplying each pair of neighboring products.
+# >
+# > If the level has an odd number of products, the last one has no pair and is carried up as it is.
+#####
+def get_paired_products(numerators, denominators):
+    num_pairs = len(numerators) // 2
+    left_numerators, right_numerators = numerators[0:2 * num_pairs:2], numerators[1:2 * num_pairs:2]
+    left_denominators, right_denominators = denominators[0:2 * num_pairs:2], denominators[1:2 * num_pairs:2]
+    # Fixed size integers are much faster, but once products could overflow them, switch to (arbitrary size) Python integers.
+    if numerators.dtype != object and max(np.log2(numerators.max()), np.log2(denominators.max())) * 2 >= 62:
+        left_numerators, right_numerators, left_denominators, right_denominators = [
+            values.astype(object) for values in [left_numerators, right_numerators, left_denominators, right_denominators]]
+    # cancel common factors across the two fractions before multiplying, as `Fraction` does
+    left_divisors = np.gcd(left_numerators, right_denominators)
+    right_divisors = np.gcd(right_numerators, left_denominators)
+    paired_numerators = (left_numerators // left_divisors) * (right_numerators // right_divisors)
+    paired_denominators = (left_denominators // right_divisors) * (right_denominators // left_divisors)
+    if len(numerators) % 2 == 1:
+        paired_numerators = np.append(paired_numerators, numerators[-1:])
+        paired_denominators = np.append(paired_denominators, denominators[-1:])
+    return paired_numerators, paired_denominators
+
+#####
+#### `get_range_product()`
+#
+# > Given a first and last term (counting from 1, and including both), find the exact value of the domino train product over that range of terms by multiplying them directly (without a product tree).
+# >
+# > This is 1 for an empty range. Long ranges are multiplied `product_tree_block_size` terms at a time, so memory use stays bounded.
+#####
+def get_range_product(first_term, last_term):
+    range_product = Fraction(1)
+    for block_first_term in range(first_term, last_term + 1, product_tree_block_size):
+        numerators, denominators = get_term_products(block_first_term, min(block_first_term + product_tree_block_size - 1, last_term))
+        while len(numerators) > 1:
+            numerators, denominators = get_paired_products(numerators, denominators)
+        range_product *= Fraction(int(numerators[0]), int(denominators[0]))
+    return range_product
+
+#####
+#### `get_product_tree()`
+#
+# > Given a number of terms, build the product tree for terms 1 through that number.
+# >
+# > The first level lists the product of each block of `2 ** product_tree_leaf_levels` terms (the last block may be shorter), and each following level lists the products of pairs from the level before it, up to the single product of all the terms. Each level is a pair of arrays, of numerators and of denominators, in lowest terms.
+#####
+def get_product_tree(num_terms):
+    blocks = []
+    for first_term in range(1, num_terms + 1, product_tree_block_size):
+        numerators, denominators = get_term_products(first_term, min(first_term + product_tree_block_size - 1, num_terms))
+        for _ in range(product_tree_leaf_levels):
+            numerators, denominators = get_paired_products(numerators, denominators)
+        blocks.append((numerators, denominators))
+    numerators = np.concatenate([block[0] for block in blocks])
+    denominators = np.concatenate([block[1] for block in blocks])
+    del blocks
+    product_tree = [(numerators, denominators)]
+    while len(numerators) > 1:
+        numerators, denominators = get_paired_products(numerators, denominators)
+        product_tree.append((numerators, denominators))
+    return product_tree
+
+#####
+#### `get_covering_product_tree()`
+#
+# > Given a last term, find a product tree covering terms 1 through (at least) that term.
+# >
+# > The last tree built is reused as long as it covers the term. Otherwise, it's replaced by a tree for terms 1 through that term.
+#####
+def get_covering_product_tree(last_term):
+    if cached_product_tree[0] < last_term:
+        # let go of the old tree first, so both aren't kept at once
+        cached_product_tree[:] = [0, None]
+        cached_product_tree[:] = [last_term, get_product_tree(last_term)]
+    return cached_product_tree[1]
+
+#####
+#### `get_partial_product()`
+#
+# > Given a first and last term (counting from 1, and including both), find the exact value of the domino train product over that range of terms.
+# >
+# > Once a tree covering the range has been built, this only combines a couple of products per level of the tree, plus the few terms at either end of the range. A tree is only built for ranges that make up at least half of the terms it would cover, since building it takes about as long as multiplying those terms directly.
+#####
+def get_partial_product(first_term, last_term):
+    if first_term < 1 or last_term < first_term: raise ValueError('Terms must satisfy 1 <= first_term <= last_term!')
+    num_terms = last_term - first_term + 1
+    if num_terms < product_tree_min_terms or (cached_product_tree[0] < last_term and num_terms * 2 < last_term):
+        return get_range_product(first_term, last_term)
+    leaf_size = 2 ** product_tree_leaf_levels
+    # The range in blocks of terms (the first level of the tree), half open and 0-based. The blocks only partly in the range, at either end, are multiplied directly.
+    start = -(-(first_term - 1) // leaf_size)
+    stop = last_term // leaf_size
+    partial_product = get_range_product(first_term, start * leaf_size) * get_range_product(stop * leaf_size + 1, last_term)
+    product_tree = get_covering_product_tree(last_term)
+    # Walk up the tree, multiplying in the sub-products that stick out of the range on either end.
+    for numerators, denominators in product_tree:
+        if start >= stop: break
+        if start % 2 == 1:
+            partial_product *= Fraction(int(numerators[start]), int(denominators[start]))
+            start += 1
+        if stop % 2 == 1:
+            stop -= 1
+            partial_product *= Fraction(int(numerators[stop]), int(denominators[stop]))
+        start //= 2
+        stop //= 2
+    return partial_product
+
+#####
+#### `get_telescoped_product()`
+#
+# > Given a first and last term (counting from 1, and including both), find the exact value of the domino train product over that range of terms from its closed form.
+# >
+# > Since the first fraction's denominator in each term is the second fraction's numerator, each term is (2 * `term` - 1) / (2 * `term` + 1), and the product telescopes to (2 * `first_term` - 1) / (2 * `last_term` + 1). This is an independent check on `get_partial_product()`.
+#####
+def get_telescoped_product(first_term, last_term):
+    if first_term < 1 or last_term < first_term: raise ValueError('Terms must satisfy 1 <= first_term <= last_term!')
+    return Fraction(2 * first_term - 1, 2 * last_term + 1)
+
+#####
+#### `get_decimal_product()`
+#
+# > Given an exact value of the product (a fraction), find its decimal value to the given number of significant digits.
+#####
+def get_decimal_product(product, digits = 50):
+    with localcontext() as context:
+        context.prec = digits
+        return Decimal(product.numerator) / Decimal(product.denominator)
+
+#####
+#### `print_train_product()`
+#
+# > Print the exact and decimal values of the domino train product over all the terms on the cube, checked against its closed form from `get_telescoped_product()`.
+#####
+def print_train_product():
+    # each term covers 4 squares
+    num_terms = int(num_squares * num_sides_dots / 4)
+    train_product = get_partial_product(1, num_terms)
+    if train_product != get_telescoped_product(1, num_terms): raise ValueError('The domino train product does not match its closed form!')
+    print('Domino Train Product for Terms 1 to ' + str(num_terms) + ':')
+    print(str(train_product) + ' = ' + str(get_decimal_product(train_product)))
+
 
 
 #####
@@ -177,7 +405,7 @@ def get_number(square):
 #
 # **Important:** Note that these are paramaters for the local Hilbert curves on one side of the cube, not the global Hilbert curve covering the whole cube.
 #
-# This uses the [`hilbertcurve`](https://pypi.org/project/hilbertcurve/) package.
+# This follows the conventions of the [`hilbertcurve`](https://pypi.org/project/hilbertcurve/) package, though the calculations themselves are done by the kernel below.
 #
 # - `iterations` is the number of iterations of (the polygonal approximation to) the Hilbert curve. For _Metaphysics_, this will be 4 for the smallest scale version but greater for the larger scale versions.
 # - `dimensions` is the number of spatial dimensions. For _Metaphysics_, this will always be 2, since each local Hilbert curve corresponds to a tiling of one side of a cube (which has 2 dimensions).
@@ -189,11 +417,137 @@ def get_number(square):
 #####
 iterations = 4
 dimensions = 2
-hilbert_curve = HilbertCurve(iterations, dimensions)
 num_coordinates_per_side = 2 ** iterations
 num_squares = num_coordinates_per_side ** dimensions
 
 
+#####
+### Hilbert Curve Kernel
+#
+# Calculating squares from coordinates (and vice versa) one point at a time with the `hilbertcurve` package is slow for large numbers of points. So, these functions do it for whole (NumPy) arrays of points or distances at once.
+#
+# They use the classic state machine for a 2-dimensional Hilbert curve. Each iteration of the curve splits a square into 4 quadrants, which the curve passes through in an order that depends on the curve's orientation there (its "state"). So, going from the largest quadrants to the smallest, each 2 bits of the distance along the curve pick out a quadrant, i.e. 1 bit of each coordinate, and then the state for the next iteration. There are 4 states:
+# - 0: starts in the lower left and ends in the lower right corner (the "standard" orientation)
+# - 1: starts in the lower left and ends in the upper left corner
+# - 2: starts in the upper right and ends in the upper left corner
+# - 3: starts in the upper right and ends in the lower right corner
+#
+# Quadrants are numbered 2 * x + y, where x and y are each 0 or 1. The tables are indexed by 4 * state + digit (for decoding) or 4 * state + quadrant (for encoding), where the digit is the 2 bits of the distance for that iteration.
+#
+# This matches the `hilbertcurve` package exactly, which `check_hilbert_curve_kernel()` confirms.
+#####
+hilbert_quadrants_from_digits = np.array([0, 1, 3, 2,  0, 2, 3, 1,  3, 2, 0, 1,  3, 1, 0, 2])
+hilbert_states_from_digits = np.array([1, 0, 0, 3,  0, 1, 1, 2,  3, 2, 2, 1,  2, 3, 3, 0])
+hilbert_digits_from_quadrants = np.argsort(hilbert_quadrants_from_digits.reshape(4, 4), axis = 1).flatten()
+hilbert_states_from_quadrants = np.take_along_axis(hilbert_states_from_digits.reshape(4, 4), hilbert_digits_from_quadrants.reshape(4, 4), axis = 1).flatten()
+
+#####
+#### `check_hilbert_curve_iterations()`
+#
+# > Given a number of iterations, raise an error unless the kernel can handle it, i.e. unless every distance along the curve fits in a (64 bit) NumPy integer.
+#####
+def check_hilbert_curve_iterations(iterations):
+    if not 1 <= iterations <= 31: raise ValueError('The Hilbert curve kernel only handles 1 to 31 iterations!')
+
+#####
+#### `get_points_from_distances()`
+#
+# > Given an array of distances along a Hilbert curve with the given number of iterations, find the array of points (i.e. local coordinates) at those distances.
+# >
+# > As with the `hilbertcurve` package, distances off the curve raise an error rather than wrapping around.
+#####
+def get_points_from_distances(distances, iterations):
+    check_hilbert_curve_iterations(iterations)
+    distances = np.asarray(distances, dtype = np.int64)
+    if distances.size > 0 and (distances.min() < 0 or distances.max() >= 4 ** iterations):
+        raise ValueError('Distances must be from 0 to ' + str(4 ** iterations - 1) + ' for ' + str(iterations) + ' iterations!')
+    states = np.zeros(distances.shape, dtype = np.int64)
+    points = np.zeros(distances.shape + (dimensions,), dtype = np.int64)
+    for level in range(iterations - 1, -1, -1):
+        indices = 4 * states + ((distances >> (2 * level)) & 3)
+        quadrants = hilbert_quadrants_from_digits[indices]
+        points[..., 0] |= (quadrants >> 1) << level
+        points[..., 1] |= (quadrants & 1) << level
+        states = hilbert_states_from_digits[indices]
+    return points
+
+#####
+#### `get_distances_from_points()`
+#
+# > Given an array of points (i.e. local coordinates) and the number of iterations of a Hilbert curve, find the array of distances along the curve to those points.
+# >
+# > As with the `hilbertcurve` package, points off the side raise an error rather than being masked.
+#####
+def get_distances_from_points(points, iterations):
+    check_hilbert_curve_iterations(iterations)
+    points = np.asarray(points, dtype = np.int64)
+    if points.ndim == 0 or points.shape[-1] != dimensions: raise ValueError('Points must have ' + str(dimensions) + ' coordinates each!')
+    if points.size > 0 and (points.min() < 0 or points.max() >= 2 ** iterations):
+        raise ValueError('Coordinates must be from 0 to ' + str(2 ** iterations - 1) + ' for ' + str(iterations) + ' iterations!')
+    states = np.zeros(points.shape[:-1], dtype = np.int64)
+    distances = np.zeros(points.shape[:-1], dtype = np.int64)
+    for level in range(iterations - 1, -1, -1):
+        indices = 4 * states + 2 * ((points[..., 0] >> level) & 1) + ((points[..., 1] >> level) & 1)
+        distances |= hilbert_digits_from_quadrants[indices] << (2 * level)
+        states = hilbert_states_from_quadrants[indices]
+    return distances
+
+#####
+#### `check_hilbert_curve_kernel()`
+#
+# > Check that the kernel above matches the `hilbertcurve` package for a Hilbert curve with the given number of iterations, in both directions.
+# >
+# > Every distance is checked for small curves, and a random sample of them for large ones. This raises an error if the package isn't installed or if they don't match.
+#####
+def check_hilbert_curve_kernel(iterations, num_samples = 100000):
+    if HilbertCurve is None: raise ImportError('The hilbertcurve package is needed to check the Hilbert curve kernel!')
+    curve = HilbertCurve(iterations, dimensions)
+    if 4 ** iterations <= num_samples: distances = list(range(0, 4 ** iterations))
+    else: distances = random.sample(range(0, 4 ** iterations), num_samples)
+    points = curve.points_from_distances(distances)
+    if get_points_from_distances(distances, iterations).tolist() != points: raise ValueError('Hilbert curve kernel points don\'t match the hilbertcurve package!')
+    if get_distances_from_points(points, iterations).tolist() != distances: raise ValueError('Hilbert curve kernel distances don\'t match the hilbertcurve package!')
+
+#####
+#### `get_hilbert_curve_kernel_benchmark()`
+#
+# > Find how long the kernel and the `hilbertcurve` package take to calculate the given number of points and distances for Hilbert curves with the given numbers of iterations.
+# >
+# > This returns one row per number of iterations: the iterations, the number of points, and then the times (in seconds) for the kernel and the package to decode and then encode them.
+#####
+def get_hilbert_curve_kernel_benchmark(iterations_list = [4, 8, 12, 16], num_points = 100000):
+    if HilbertCurve is None: raise ImportError('The hilbertcurve package is needed to benchmark the Hilbert curve kernel!')
+    data = []
+    for benchmark_iterations in iterations_list:
+        check_hilbert_curve_kernel(benchmark_iterations)
+        curve = HilbertCurve(benchmark_iterations, dimensions)
+        distances = [random.randrange(0, 4 ** benchmark_iterations) for _ in range(num_points)]
+        start_time = time.perf_counter()
+        points = get_points_from_distances(distances, benchmark_iterations)
+        kernel_decode_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        points = curve.points_from_distances(distances)
+        package_decode_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        get_distances_from_points(points, benchmark_iterations)
+        kernel_encode_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        curve.distances_from_points(points)
+        package_encode_time = time.perf_counter() - start_time
+        data.append([benchmark_iterations, num_points, kernel_decode_time, package_decode_time, kernel_encode_time, package_encode_time])
+    return data
+
+#####
+#### `print_hilbert_curve_kernel_benchmark()`
+#
+# > Print a table of the benchmark from `get_hilbert_curve_kernel_benchmark()`.
+#####
+def print_hilbert_curve_kernel_benchmark(iterations_list = [4, 8, 12, 16], num_points = 100000):
+    column_headers = ['Iterations', 'Points', 'Kernel Decode (s)', 'Package Decode (s)', 'Kernel Encode (s)', 'Package Encode (s)']
+    print('Hilbert Curve Kernel Benchmark:')
+    print(tabulate(get_hilbert_curve_kernel_benchmark(iterations_list, num_points), column_headers, floatfmt = '.4f'))
+
+
 #####
 ### Dots
 # 
@@ -312,7 +666,44 @@ white_areas_side_list = [side_1_dots, side_2_dots, side_4_dots, side_6_dots, sid
 
 #####
 ### Diagrams
+#
+# Each diagram is saved in every format listed in `diagram_formats`, and its figure is closed once saved so that rendering many diagrams doesn't leave figures open.
+#####
+diagram_formats = ['png', 'svg']
+
+# Each number of iterations has its own color and line width in Hilbert curve diagrams, so diagrams can only be created for up to as many iterations as there are colors. Diagrams with more squares than `max_diagram_labels` leave out the number labels on squares, which would be unreadable anyway and slow to draw.
+diagram_colors = ['red', 'blue', 'black', 'green', 'purple', 'cyan', 'gray']
+diagram_line_widths = [32, 16, 8, 4, 2, 1, 0.5]
+max_diagram_labels = 2 ** 8
+
+#####
+#### `get_pyplot()`
+#
+# > Import Matplotlib's `pyplot` with the non-interactive Agg backend, so diagrams can be rendered in worker processes without a display.
+# >
+# > This is only done when a diagram is created, since importing `pyplot` takes longer than most of the calculations.
 #####
+def get_pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+#####
+#### `save_diagram()`
+#
+# > Save the current figure in each of the diagram formats under the given file name (without extension), then close it.
+# >
+# > This returns the list of file names written.
+#####
+def save_diagram(file_name):
+    plt = get_pyplot()
+    file_names = []
+    for diagram_format in diagram_formats:
+        file_names.append(file_name + '.' + diagram_format)
+        plt.savefig(file_names[-1])
+    plt.close()
+    return file_names
 
 #####
 #### `create_hilbert_curve_diagram()`
@@ -322,46 +713,51 @@ white_areas_side_list = [side_1_dots, side_2_dots, side_4_dots, side_6_dots, sid
 # > This adapts code from the GitHub repo of the [`hilbertcurve`](https://pypi.org/project/hilbertcurve/) package. The side index is that of the ordering of sides defined above. This function creates a diagram for one side at a time.
 # >
 # > Note that, currently, this does not adjust the orientation of the Hilbert curve to be type 1 or 2 for a given side (as defined above). All Hilbert curves it produces are in "standard" orientation.
-#####
-def create_hilbert_curve_diagram(side_index):
+# >
+# > `diagram_iterations` is the number of iterations of the Hilbert curve in the diagram, by default `iterations`.
+#####
+def create_hilbert_curve_diagram(side_index, diagram_iterations = iterations):
+    # checked before creating the figure, so an invalid call doesn't leave a figure open
+    if not 1 <= diagram_iterations <= len(diagram_colors):
+        raise ValueError('Hilbert curve diagrams can only be created for 1 to ' + str(len(diagram_colors)) + ' iterations!')
+    plt = get_pyplot()
+    diagram_num_coordinates_per_side = 2 ** diagram_iterations
     # this has to be at the beginning, not with the other 'plt' statements below
     plt.figure(figsize = (10,10))
     min_coordinate = 0
-    max_coordinate = num_coordinates_per_side - 1
+    max_coordinate = diagram_num_coordinates_per_side - 1
     cmin = min_coordinate - 0.5
     cmax = max_coordinate + 0.5
-    colors = ['red', 'blue', 'black', 'green', 'purple', 'cyan', 'gray']
-    line_widths = [32, 16, 8, 4, 2, 1, 0.5]
     offset = 0
     dx = 0.5
-    for i in range(iterations, iterations - 1, -1):
-        curve = HilbertCurve(i, dimensions)
+    for i in range(diagram_iterations, diagram_iterations - 1, -1):
         num_coordinates_per_side_i = 2 ** i
         num_points = 2 ** (i * dimensions)
-        points = []
-        for j in range(num_points):
-            points.append(curve.point_from_distance(j))
+        points = get_points_from_distances(np.arange(0, num_points), i).tolist()
         points = [
-            [(point[0] * num_coordinates_per_side / num_coordinates_per_side_i) + offset,
-            (point[1] * num_coordinates_per_side / num_coordinates_per_side_i) + offset]
+            [(point[0] * diagram_num_coordinates_per_side / num_coordinates_per_side_i) + offset,
+            (point[1] * diagram_num_coordinates_per_side / num_coordinates_per_side_i) + offset]
             for point in points]
         connectors = range(3, num_points, 4)
-        color = colors[i - 1]
-        # '+ len(line_widths) - iterations' so it starts at a smaller line width (later in the list) when iterations is smaller than the number of line width values
+        color = diagram_colors[i - 1]
+        # '+ len(diagram_line_widths) - diagram_iterations' so it starts at a smaller line width (later in the list) when iterations is smaller than the number of line width values
         # Note that to increase iterations beyond this number, more line width values (and colors) should be added
-        line_width = line_widths[i - 1 + len(line_widths) - iterations]
+        line_width = diagram_line_widths[i - 1 + len(diagram_line_widths) - diagram_iterations]
+        # Plotting every segment separately is slow, so the segments are gathered into one solid and one dashed line, with NaN values breaking each line between segments.
+        solid_xs, solid_ys, dashed_xs, dashed_ys = [], [], [], []
         for k in range(num_points - 1):
             if k in connectors:
-                line_style = '--'
-                alpha = 0.5
+                dashed_xs.extend([points[k][0], points[k + 1][0], float('nan')])
+                dashed_ys.extend([points[k][1], points[k + 1][1], float('nan')])
             else:
-                line_style = '-'
-                alpha = 1.0
-            plt.plot((points[k][0], points[k + 1][0]), (points[k][1], points[k + 1][1]),
-                    color = color, linewidth = line_width, linestyle = line_style, alpha = alpha)
-        for l in range(num_points):
-            plt.scatter(points[l][0], points[l][1], 60, color = color)
-            plt.text(points[l][0] + 0.1, points[l][1] + 0.1, str(l + side_index * num_points), color = color)
+                solid_xs.extend([points[k][0], points[k + 1][0], float('nan')])
+                solid_ys.extend([points[k][1], points[k + 1][1], float('nan')])
+        plt.plot(solid_xs, solid_ys, color = color, linewidth = line_width, linestyle = '-', alpha = 1.0)
+        plt.plot(dashed_xs, dashed_ys, color = color, linewidth = line_width, linestyle = '--', alpha = 0.5)
+        plt.scatter([point[0] for point in points], [point[1] for point in points], 60, color = color)
+        if num_points <= max_diagram_labels:
+            for l in range(num_points):
+                plt.text(points[l][0] + 0.1, points[l][1] + 0.1, str(l + side_index * num_points), color = color)
         offset += dx
         dx *= 2
     plt.title('Hilbert Curve Pattern for ' + str(side_names[side_index]))
@@ -371,9 +767,82 @@ def create_hilbert_curve_diagram(side_index):
     plt.xlabel('x', fontsize = 16)
     plt.ylabel('y', fontsize = 16)
     plt.tight_layout()
-    plt.savefig(str(side_names[side_index]) + ' - ' + str(iterations) + ' iterations, ' + str(dimensions) + ' dimensions.png')
+    return save_diagram(str(side_names[side_index]) + ' - ' + str(diagram_iterations) + ' iterations, ' + str(dimensions) + ' dimensions')
 
-create_hilbert_curve_diagram(0)
+#####
+#### `create_net_diagram()`
+#
+# > Create a diagram of the net of the cube, i.e. all six sides laid out as in the diagram above, with the Hilbert curve on each side and its dots shaded.
+# >
+# > As with `create_hilbert_curve_diagram()`, all Hilbert curves are in "standard" orientation. The dots are shaded in the same (local) coordinates that are used to find their squares, scaled to the number of iterations as in the chunked pipeline below. `dots_layout` is a layout of dots (see `get_layout()`), by default the die's own.
+#####
+def create_net_diagram(diagram_iterations = iterations, dots_layout = None):
+    if diagram_iterations < dots_iterations: raise ValueError('The dots are only defined for ' + str(dots_iterations) + ' or more iterations!')
+    plt = get_pyplot()
+    if dots_layout is None: dots_layout = get_layout()
+    diagram_num_coordinates_per_side = 2 ** diagram_iterations
+    plt.figure(figsize = (20,15))
+    points = get_points_from_distances(np.arange(0, diagram_num_coordinates_per_side ** dimensions), diagram_iterations).tolist()
+    # which squares on each side are in dots, scaled up from the coordinates the dots are defined in
+    region_templates = get_region_templates(dots_layout)
+    coordinates = np.arange(0, diagram_num_coordinates_per_side) >> (diagram_iterations - dots_iterations)
+    for side_index in range(num_sides_dots):
+        # Side 1 is in the upper left, and each following side is either to the right of or below the previous one.
+        x_offset = int((side_index + 1) / 2) * diagram_num_coordinates_per_side
+        y_offset = (int(num_sides_dots / 2) - 1 - int(side_index / 2)) * diagram_num_coordinates_per_side
+        is_dot = region_templates[side_index][np.ix_(coordinates, coordinates)] < len(dots_layout)
+        # transposed, since images are indexed by row (y) and then column (x)
+        plt.imshow(np.where(is_dot, 0.2, 0.0).T, origin = 'lower', cmap = 'Greys', vmin = 0, vmax = 1, interpolation = 'nearest',
+                extent = (x_offset - 0.5, x_offset + diagram_num_coordinates_per_side - 0.5, y_offset - 0.5, y_offset + diagram_num_coordinates_per_side - 0.5))
+        plt.plot([x_offset + point[0] for point in points], [y_offset + point[1] for point in points], color = 'red', linewidth = 1)
+        plt.gca().add_patch(plt.Rectangle((x_offset - 0.5, y_offset - 0.5), diagram_num_coordinates_per_side, diagram_num_coordinates_per_side, fill = False, linewidth = 2))
+        plt.text(x_offset + diagram_num_coordinates_per_side / 2 - 0.5, y_offset + diagram_num_coordinates_per_side / 2 - 0.5, side_names[side_index],
+                fontsize = 16, horizontalalignment = 'center', verticalalignment = 'center')
+    plt.title('Hilbert Curve Pattern for the Net of the Cube')
+    plt.xlim(-0.5, (int(num_sides_dots / 2) + 1) * diagram_num_coordinates_per_side - 0.5)
+    plt.ylim(-0.5, int(num_sides_dots / 2) * diagram_num_coordinates_per_side - 0.5)
+    plt.axis('off')
+    plt.tight_layout()
+    return save_diagram('Net - ' + str(diagram_iterations) + ' iterations, ' + str(dimensions) + ' dimensions')
+
+#####
+#### `render_diagrams()`
+#
+# > Render the diagrams for all sides and the net of the cube in a pool of worker processes, so the calculations below can keep running in the meantime.
+# >
+# > This returns the pool of workers and a list of futures, one per diagram, each of which results in the list of file names written for that diagram. `workers` is the number of worker processes (by default, the number of CPUs).
+#####
+def render_diagrams(workers = None, diagram_iterations = iterations, dots_layout = None):
+    executor = ProcessPoolExecutor(max_workers = workers)
+    diagram_futures = []
+    for side_index in range(num_sides_dots):
+        diagram_futures.append(executor.submit(create_hilbert_curve_diagram, side_index, diagram_iterations))
+    diagram_futures.append(executor.submit(create_net_diagram, diagram_iterations, dots_layout))
+    return [executor, diagram_futures]
+
+#####
+#### `get_diagram_file_names()`
+#
+# > Given the pool of workers and futures from `render_diagrams()`, wait for the diagrams, then shut the pool down and list the file names written.
+# >
+# > The pool is only shut down once its work is done, and waits for its workers to exit, since shutting it down without waiting can make Python report an error at exit.
+#####
+def get_diagram_file_names(executor, diagram_futures):
+    file_names = []
+    for diagram_future in diagram_futures:
+        file_names.extend(diagram_future.result())
+    executor.shutdown()
+    return file_names
+
+#####
+#### `print_diagrams()`
+#
+# > Wait for the diagrams being rendered, then print the file names written.
+#####
+def print_diagrams(executor, diagram_futures):
+    file_names = get_diagram_file_names(executor, diagram_futures)
+    print('Diagrams:')
+    for file_name in file_names: print(file_name)
 
 
 # Colors for tables
@@ -409,8 +878,6 @@ def print_values():
         else: data.append(['........', '........', '......', '........'])
     print(tabulate(data, column_headers, tablefmt = "pretty"))
 
-print_values()
-
 
 #####
 #### `print_number_counts()`
@@ -427,8 +894,6 @@ def print_number_counts():
     print("Number counts:")
     print(tabulate(data, column_headers))
 
-print_number_counts()
-
 
 #####
 ### Coordinates and Squares
@@ -504,15 +969,14 @@ def get_squares(coordinates):
     for coordinate in coordinates:
         local_coordinate = []
         for i in range(0, len(coordinate)):
-            # Mod by sqrt(num_squares) to make the coordinate local, so that distances_from_points from the hilbertcurve package can be used to calculate local square numbers.
+            # Mod by sqrt(num_squares) to make the coordinate local, so that get_distances_from_points() can be used to calculate local square numbers.
             local_coordinate.append(coordinate[i] % int(math.sqrt(num_squares)))
         local_coordinates.append(local_coordinate)
     points = local_coordinates
-    distances = hilbert_curve.distances_from_points(points)
+    distances = get_distances_from_points(points, iterations)
     # Finally, calculate global square values simply by adding num_squares (per side), scaled by the side index
-    global_squares = []
-    for distance in distances: global_squares.append(distance + (side_index * num_squares))
-    return global_squares
+    global_squares = distances + (side_index * num_squares)
+    return global_squares.tolist()
 
 
 #####
@@ -526,8 +990,6 @@ def print_squares(coordinates, coordinates_group, coordinate_names):
     print('Squares for ' + coordinate_names[coordinates_group.index(coordinates)] + ':')
     print(get_squares(coordinates))
 
-print_squares(dot_1A, dots, dot_names)
-
 
 #####
 #### `get_other_domino_square()`
@@ -608,32 +1070,118 @@ def get_dominoes_counts(full_dominoes, half_dominoes):
 #### `get_sum_dominoes_counts()`
 #
 # > Given (a list of a list of) coordinates (e.g. a list of dots), find the sum of counts for full and half dominoes.
+# >
+# > This uses the region label map (see below), so the dots and white areas are all counted in the one sweep over the cube.
 #####
 def get_sum_dominoes_counts(coordinates):
-    # initilialize with zero values so they can later be overwritten (to avoid 'index out of range' error)
-    sum_full_dominoes_counts = [
-        [0, 0], 
-        [1, 0, 0], 
-        [2, 0, 0, 0], 
-        [3, 0, 0, 0, 0], 
-        [4, 0, 0, 0, 0, 0], 
-        [5, 0, 0, 0, 0, 0, 0], 
-        [6, 0, 0, 0, 0, 0, 0, 0]]
-    sum_half_dominoes_counts = [[0, 0, 0, 0, 0, 0, 0]]
+    full_dominoes_counts, half_dominoes_counts = get_coordinates_dominoes_counts(coordinates)
+    return get_dominoes_counts_tables(full_dominoes_counts.sum(axis = 0), half_dominoes_counts.sum(axis = 0))
+
+
+#####
+### Region Label Map
+#
+# Rather than finding the dominoes of each dot and white area ("region") separately, it's much faster to label every square on the cube with the region it's in and then sweep along the domino train once. Two squares covered by the same domino form a full domino if they're in the same region. Otherwise, each is a half domino of its own region.
+#
+# Full domino counts are kept in arrays indexed by region, the larger number, and then the smaller number, which matches the row and column order of the tables from `get_dominoes_counts()`. Half domino counts are indexed by region and number.
+#####
+
+#####
+#### `get_region_label_map()`
+#
+# > Given (a list of a list of) global coordinates (e.g. a list of dots), label each square on the cube with the index of the list of coordinates it's in.
+# >
+# > Squares that aren't in any of them are labeled -1.
+#####
+def get_region_label_map(coordinates):
+    region_label_map = np.full(num_squares * num_sides_dots, -1)
     for i in range(0, len(coordinates)):
-        full_dominoes, half_dominoes = get_dominoes(coordinates[i])
-        full_dominoes_counts, half_dominoes_counts = get_dominoes_counts(full_dominoes, half_dominoes)
-        # add up full domino counts
-        for j in range(0, len(full_dominoes_counts)):
-            # start at 1 since the first items are just row headers
-            for k in range(1, len(full_dominoes_counts[j])):
-                # adjust by frequency
-                sum_full_dominoes_counts[j][k] += (full_dominoes_counts[j][k])
-        # add up half domino counts
-        for l in range(0, len(half_dominoes_counts[0])):
-            # adjust by frequency
-            sum_half_dominoes_counts[0][l] += (half_dominoes_counts[0][l])
-    return sum_full_dominoes_counts, sum_half_dominoes_counts
+        region_label_map[get_squares(coordinates[i])] = i
+    return region_label_map
+
+#####
+#### `get_sweep_dominoes_counts()`
+#
+# > Given a run of consecutive squares along the domino train, count the full and half dominoes in every region and on every side in a single sweep.
+# >
+# > `padded_labels` and `padded_numbers` are the region labels and domino numbers for the squares, plus one more square at each end, so that the other half of every domino is known. (Squares off the ends of the train are labeled -1.) `sides` are the sides of the squares. This returns arrays of full and half domino counts for the regions, followed by the same for the sides.
+# >
+# > Each full domino is counted at its odd square, so runs of squares that follow one another can be counted separately and added up.
+#####
+def get_sweep_dominoes_counts(squares, padded_labels, padded_numbers, sides, num_regions):
+    labels = padded_labels[1:-1]
+    numbers = padded_numbers[1:-1]
+    # Each odd square shares its domino with the next square and each even square with the previous one. (See `get_other_domino_square()`.)
+    is_odd = squares % 2 == 1
+    other_labels = np.where(is_odd, padded_labels[2:], padded_labels[:-2])
+    other_numbers = np.where(is_odd, padded_numbers[2:], padded_numbers[:-2])
+    is_labeled = labels >= 0
+    is_full = is_labeled & (labels == other_labels)
+    is_half = is_labeled & ~is_full
+    # count each full domino only once, at its odd square
+    is_counted_full = is_full & is_odd
+    full_dominoes = np.maximum(numbers, other_numbers) * 7 + np.minimum(numbers, other_numbers)
+    full_dominoes_counts = np.bincount(labels[is_counted_full] * 49 + full_dominoes[is_counted_full], minlength = num_regions * 49).reshape(num_regions, 7, 7)
+    half_dominoes_counts = np.bincount(labels[is_half] * 7 + numbers[is_half], minlength = num_regions * 7).reshape(num_regions, 7)
+    sides_full_dominoes_counts = np.bincount(sides[is_counted_full] * 49 + full_dominoes[is_counted_full], minlength = num_sides_dots * 49).reshape(num_sides_dots, 7, 7)
+    sides_half_dominoes_counts = np.bincount(sides[is_half] * 7 + numbers[is_half], minlength = num_sides_dots * 7).reshape(num_sides_dots, 7)
+    return full_dominoes_counts, half_dominoes_counts, sides_full_dominoes_counts, sides_half_dominoes_counts
+
+#####
+#### `get_label_map_dominoes_counts()`
+#
+# > Given a region label map and the number of regions, count the full and half dominoes in every region in a single sweep along the domino train.
+# >
+# > The same sweep also counts them for every side, i.e. the totals over the regions on each side. This returns arrays of full and half domino counts for the regions, followed by the same for the sides.
+#####
+def get_label_map_dominoes_counts(region_label_map, num_regions):
+    squares = np.arange(0, len(region_label_map))
+    # The first and last squares are half dominoes whose other halves are off the ends of the train, so the labels are padded with -1 at both ends.
+    padded_labels = np.concatenate(([-1], region_label_map, [-1]))
+    padded_numbers = get_numbers(np.arange(-1, len(region_label_map) + 1))
+    return get_sweep_dominoes_counts(squares, padded_labels, padded_numbers, squares // num_squares, num_regions)
+
+#####
+#### `get_dominoes_counts_tables()`
+#
+# > Given arrays of full and half domino counts (for one region or side), convert them into tables in the same format as `get_dominoes_counts()`, i.e. with row headers for full dominoes.
+#####
+def get_dominoes_counts_tables(full_dominoes_counts, half_dominoes_counts):
+    full_dominoes_table = []
+    for i in range(0, 7):
+        full_dominoes_table.append([i] + [int(count) for count in full_dominoes_counts[i][:i + 1]])
+    half_dominoes_table = [[int(count) for count in half_dominoes_counts]]
+    return full_dominoes_table, half_dominoes_table
+
+# Every dot and white area on the cube, in the order of their labels in the region label map.
+regions = dots + white_areas
+region_names = dot_names + white_area_names
+
+#####
+#### `get_regions_dominoes_counts()`
+#
+# > Label every square on the cube with the dot or white area it's in, then count the full and half dominoes in every region and on every side in a single sweep.
+# >
+# > This returns the same arrays as `get_label_map_dominoes_counts()`, with the regions in the order of `regions`. The sweep is cached, so all of the tables below share it.
+#####
+@lru_cache(maxsize = 1)
+def get_regions_dominoes_counts():
+    return get_label_map_dominoes_counts(get_region_label_map(regions), len(regions))
+
+#####
+#### `get_coordinates_dominoes_counts()`
+#
+# > Given (a list of a list of) coordinates (e.g. a list of dots), find arrays of full and half domino counts for each list of coordinates.
+# >
+# > Dots and white areas are looked up in the sweep from `get_regions_dominoes_counts()`. Any other lists of coordinates are counted in a sweep of their own.
+#####
+def get_coordinates_dominoes_counts(coordinates):
+    if all(region in regions for region in coordinates):
+        region_indices = [regions.index(region) for region in coordinates]
+        full_dominoes_counts, half_dominoes_counts, _, _ = get_regions_dominoes_counts()
+        return full_dominoes_counts[region_indices], half_dominoes_counts[region_indices]
+    full_dominoes_counts, half_dominoes_counts, _, _ = get_label_map_dominoes_counts(get_region_label_map(coordinates), len(coordinates))
+    return full_dominoes_counts, half_dominoes_counts
 
 
 #####
@@ -646,21 +1194,34 @@ def get_sum_dominoes_counts(coordinates):
 def print_dominoes_counts(coordinates, names):
     full_dominoes_headers = ['#', 0, 1, 2, 3, 4, 5, 6]
     half_dominoes_headers = [0, 1, 2, 3, 4, 5, 6]
+    all_full_dominoes_counts, all_half_dominoes_counts = get_coordinates_dominoes_counts(coordinates)
     for i in range(0, len(coordinates)):
-        full_dominoes, half_dominoes = get_dominoes(coordinates[i])
-        full_dominoes_counts, half_dominoes_counts = get_dominoes_counts(full_dominoes, half_dominoes)
+        full_dominoes_counts, half_dominoes_counts = get_dominoes_counts_tables(all_full_dominoes_counts[i], all_half_dominoes_counts[i])
         print('Full Dominoes for ' + names[i] + ':')
         print(tabulate(full_dominoes_counts, full_dominoes_headers))
         print('Half Dominoes for ' + names[i] + ':')
         print(tabulate(half_dominoes_counts, half_dominoes_headers))
-    sum_full_dominoes_counts, sum_half_dominoes_counts = get_sum_dominoes_counts(coordinates)
+    sum_full_dominoes_counts, sum_half_dominoes_counts = get_dominoes_counts_tables(all_full_dominoes_counts.sum(axis = 0), all_half_dominoes_counts.sum(axis = 0))
     print('Full Dominoes for All:')
     print(tabulate(sum_full_dominoes_counts, full_dominoes_headers))
     print('Half Dominoes for All:')
     print(tabulate(sum_half_dominoes_counts, half_dominoes_headers))
 
-print_dominoes_counts(dots, dot_names)
-print_dominoes_counts(white_areas, white_area_names)
+#####
+#### `print_sides_dominoes_counts()`
+#
+# > Print tables of full and half domino counts for each whole side, i.e. the totals over its dots and white area.
+#####
+def print_sides_dominoes_counts():
+    full_dominoes_headers = ['#', 0, 1, 2, 3, 4, 5, 6]
+    half_dominoes_headers = [0, 1, 2, 3, 4, 5, 6]
+    _, _, sides_full_dominoes_counts, sides_half_dominoes_counts = get_regions_dominoes_counts()
+    for i in range(0, num_sides_dots):
+        full_dominoes_counts, half_dominoes_counts = get_dominoes_counts_tables(sides_full_dominoes_counts[i], sides_half_dominoes_counts[i])
+        print('Full Dominoes for ' + side_names[i] + ':')
+        print(tabulate(full_dominoes_counts, full_dominoes_headers))
+        print('Half Dominoes for ' + side_names[i] + ':')
+        print(tabulate(half_dominoes_counts, half_dominoes_headers))
 
 
 #####
@@ -722,8 +1283,452 @@ def print_min_num_sets(coordinates):
     print('Minimum Number of Domino Sets to Cover All:')
     print(min_num_sets)
 
-print_min_num_sets(dots)
-print_min_num_sets(white_areas)
+#####
+### Chunked Pipeline
+#
+# At larger scales, e.g. 12 or 13 iterations, each side has 16 to 67 million squares, which is far too many to hold all the coordinates, squares, and dominoes above in memory at once. So, the functions below instead process each side in "chunks", i.e. ranges of distances along its Hilbert curve, and only keep counts of dominoes between them.
+#
+# The dots above are only defined for 4 iterations (`dots_iterations`). At more iterations, each of their squares is scaled up into a block of squares, so that the dots keep the same shape and place on each side. Other layouts of dots, defined the same way, can be loaded from a file (see `load_layout()`).
+#
+# Each chunk also looks at the square just before it and the square just after it, so dominoes that cross from one chunk into the next are counted correctly (and only once) without chunks having to wait on one another. If a directory is given, each chunk's counts are saved there as soon as it's done, so a run that's interrupted picks up where it left off.
+#####
+dots_iterations = 4
+
+#####
+#### `get_layout()`
+#
+# > Get the layout of the dots on the die, i.e. a list of the name, side index, and coordinates of each dot, in the order of `dots`.
+#####
+def get_layout():
+    layout = []
+    for i in range(0, len(dots)):
+        layout.append([dot_names[i], sides_dots.index(dots_side_list[i]), dots[i]])
+    return layout
+
+#####
+#### `load_layout()`
+#
+# > Load a layout of dots from a JSON file, in the same format as `get_layout()`.
+# >
+# > The file maps each side name (e.g. 'Side 1') to an object that maps each dot name on that side (e.g. 'Dot 1A') to its list of local coordinates, for `dots_iterations` iterations. For example: `{"Side 1": {"Dot 1A": [[6,7], [6,8], ...]}, "Side 2": {...}, ...}`
+#####
+def load_layout(file_name):
+    with open(file_name) as layout_file: sides_layout = json.load(layout_file)
+    if not isinstance(sides_layout, dict): raise ValueError('A layout file must map side names to their dots!')
+    layout = []
+    for side_name in sides_layout:
+        if side_name not in side_names: raise ValueError('Unknown side in layout file: ' + side_name + '!')
+        if not isinstance(sides_layout[side_name], dict): raise ValueError(side_name + ' must map dot names to their coordinates!')
+        for dot_name in sides_layout[side_name]:
+            if not isinstance(sides_layout[side_name][dot_name], list): raise ValueError(dot_name + ' must be a list of coordinates!')
+            for coordinate in sides_layout[side_name][dot_name]:
+                # 'bool' is a subclass of 'int', but 'true' and 'false' aren't coordinates
+                if not isinstance(coordinate, list) or len(coordinate) != dimensions or not all(type(value) == int for value in coordinate):
+                    raise ValueError('Coordinate ' + str(coordinate) + ' of ' + dot_name + ' must be a list of ' + str(dimensions) + ' integers!')
+                if not all(0 <= value < 2 ** dots_iterations for value in coordinate):
+                    raise ValueError('Coordinate ' + str(coordinate) + ' of ' + dot_name + ' is outside the side!')
+            layout.append([dot_name, side_names.index(side_name), sides_layout[side_name][dot_name]])
+    return layout
+
+#####
+#### `get_region_templates()`
+#
+# > Given a layout of dots (by default, the die's own), label each square on each side, for `dots_iterations` iterations, with the region it's in, i.e. the index of its dot in the layout or, for white areas, the number of dots plus the index of its side.
+# >
+# > This returns an array indexed by side and then local coordinates. For the die's own layout, it matches the order of `regions`.
+#####
+def get_region_templates(dots_layout = None):
+    if dots_layout is None: dots_layout = get_layout()
+    num_template_coordinates = 2 ** dots_iterations
+    region_templates = np.zeros((num_sides_dots, num_template_coordinates, num_template_coordinates), dtype = np.int64)
+    for side_index in range(0, num_sides_dots):
+        region_templates[side_index] = len(dots_layout) + side_index
+    for i in range(0, len(dots_layout)):
+        [_, side_index, dot] = dots_layout[i]
+        for coordinate in dot:
+            # the dots may be in local or global coordinates, and the modulus gives local ones either way
+            region_templates[side_index, coordinate[0] % num_template_coordinates, coordinate[1] % num_template_coordinates] = i
+    return region_templates
+
+#####
+#### `get_chunks()`
+#
+# > Given a number of iterations and a chunk size, list the chunks covering the cube, each as a side index and a range of (local) distances on that side.
+#####
+def get_chunks(chunk_iterations, chunk_size):
+    side_num_squares = 4 ** chunk_iterations
+    chunks = []
+    for side_index in range(0, num_sides_dots):
+        for start in range(0, side_num_squares, chunk_size):
+            chunks.append((side_index, start, min(start + chunk_size, side_num_squares)))
+    return chunks
+
+#####
+#### `get_squares_regions()`
+#
+# > Given an array of global squares on a cube with the given number of iterations, find the region each is in, using the region templates from `get_region_templates()`.
+# >
+# > Squares that aren't on the cube (i.e. off the ends of the domino train) are labeled -1.
+#####
+def get_squares_regions(squares, chunk_iterations, region_templates):
+    side_num_squares = 4 ** chunk_iterations
+    is_on_cube = (squares >= 0) & (squares < side_num_squares * num_sides_dots)
+    sides = (squares // side_num_squares) % num_sides_dots
+    points = get_points_from_distances(squares % side_num_squares, chunk_iterations)
+    # scale the points down to the coordinates the dots are defined in
+    shift = chunk_iterations - dots_iterations
+    return np.where(is_on_cube, region_templates[sides, points[:, 0] >> shift, points[:, 1] >> shift], -1)
+
+#####
+#### `get_chunk_dominoes_counts()`
+#
+# > Given a chunk (a side index and a range of distances on that side, from `start` up to but not including `stop`), count the full and half dominoes in every region and on every side, for a cube with the given number of iterations.
+#####
+def get_chunk_dominoes_counts(side_index, start, stop, chunk_iterations, region_templates, num_regions):
+    side_num_squares = 4 ** chunk_iterations
+    # global squares, including the one just before and the one just after the chunk
+    squares = np.arange(side_index * side_num_squares + start - 1, side_index * side_num_squares + stop + 1)
+    padded_labels = get_squares_regions(squares, chunk_iterations, region_templates)
+    padded_numbers = get_numbers(squares)
+    return get_sweep_dominoes_counts(squares[1:-1], padded_labels, padded_numbers, squares[1:-1] // side_num_squares, num_regions)
+
+#####
+#### `get_saved_chunk_dominoes_counts()`
+#
+# > Given a chunk, count its full and half dominoes as `get_chunk_dominoes_counts()` does, but load them from the chunks directory if they were already saved there, and save them there otherwise.
+#####
+def get_saved_chunk_dominoes_counts(chunk, chunk_iterations, region_templates, num_regions, chunks_directory):
+    if chunks_directory is None: return get_chunk_dominoes_counts(*chunk, chunk_iterations, region_templates, num_regions)
+    file_name = os.path.join(chunks_directory, 'chunk-' + '-'.join([str(value) for value in chunk]) + '.npz')
+    if os.path.exists(file_name):
+        with np.load(file_name) as chunk_file: return tuple(chunk_file['arr_' + str(i)] for i in range(0, 4))
+    chunk_dominoes_counts = get_chunk_dominoes_counts(*chunk, chunk_iterations, region_templates, num_regions)
+    # Write to a temporary file first, so that a chunk interrupted while being saved isn't mistaken for a finished one.
+    with open(file_name + '.tmp', 'wb') as chunk_file: np.savez(chunk_file, *chunk_dominoes_counts)
+    os.replace(file_name + '.tmp', file_name)
+    return chunk_dominoes_counts
+
+#####
+#### `check_chunks_directory()`
+#
+# > Create the chunks directory if needed, and check that any counts already saved there are from a run with the same iterations, chunk size, and dots.
+#####
+def check_chunks_directory(chunks_directory, chunk_iterations, chunk_size, region_templates):
+    os.makedirs(chunks_directory, exist_ok = True)
+    manifest = {
+        'iterations': chunk_iterations,
+        'chunk_size': chunk_size,
+        'region_templates': hashlib.sha256(region_templates.tobytes()).hexdigest()}
+    manifest_file_name = os.path.join(chunks_directory, 'manifest.json')
+    if os.path.exists(manifest_file_name):
+        with open(manifest_file_name) as manifest_file:
+            if json.load(manifest_file) != manifest: raise ValueError('The chunks directory ' + chunks_directory + ' has counts from a different run!')
+    else:
+        with open(manifest_file_name, 'w') as manifest_file: json.dump(manifest, manifest_file)
+
+#####
+#### `get_total_dominoes_counts()`
+#
+# > Given the counts for each chunk (as from `get_chunk_dominoes_counts()`), add them up.
+# >
+# > The counts are added up as the chunks finish, so only the counts (not the chunks) are kept in memory.
+#####
+def get_total_dominoes_counts(chunks_dominoes_counts):
+    total_dominoes_counts = None
+    for chunk_dominoes_counts in chunks_dominoes_counts:
+        if total_dominoes_counts is None: total_dominoes_counts = list(chunk_dominoes_counts)
+        else:
+            for i in range(0, len(total_dominoes_counts)): total_dominoes_counts[i] = total_dominoes_counts[i] + chunk_dominoes_counts[i]
+    return tuple(total_dominoes_counts)
+
+#####
+#### `get_chunked_dominoes_counts()`
+#
+# > Given a number of iterations, count the full and half dominoes in every region and on every side of the cube, one chunk at a time.
+# >
+# > `chunk_size` is the number of squares in each chunk (which bounds the memory used), `chunks_directory` is where to save the counts for each chunk (or `None` to not save them), `workers` is the number of worker processes to count chunks in, and `dots_layout` is a layout of dots (by default, the die's own). This returns the same arrays as `get_label_map_dominoes_counts()`, with the regions in the order of the dots in the layout followed by the white areas.
+#####
+def get_chunked_dominoes_counts(chunk_iterations, chunk_size = 2 ** 18, chunks_directory = None, workers = 1, dots_layout = None):
+    if chunk_iterations < dots_iterations: raise ValueError('The dots are only defined for ' + str(dots_iterations) + ' or more iterations!')
+    if chunk_size < 1: raise ValueError('The chunk size must be at least 1!')
+    if dots_layout is None: dots_layout = get_layout()
+    region_templates = get_region_templates(dots_layout)
+    num_regions = len(dots_layout) + num_sides_dots
+    if chunks_directory is not None: check_chunks_directory(chunks_directory, chunk_iterations, chunk_size, region_templates)
+    get_counts = partial(get_saved_chunk_dominoes_counts, chunk_iterations = chunk_iterations, region_templates = region_templates, num_regions = num_regions, chunks_directory = chunks_directory)
+    chunks = get_chunks(chunk_iterations, chunk_size)
+    # a pool of worker processes is only worth starting for more than one worker
+    if workers == 1: return get_total_dominoes_counts(map(get_counts, chunks))
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        return get_total_dominoes_counts(executor.map(get_counts, chunks))
+
+#####
+#### `get_chunked_min_num_sets()`
+#
+# > Given a number of iterations, find the minimum number of domino sets required for the dots and for the white areas, counting dominoes one chunk at a time.
+# >
+# > The other inputs are as for `get_chunked_dominoes_counts()`. For 4 iterations, these are the same as the values `print_min_num_sets()` prints for `dots` and `white_areas`.
+#####
+def get_chunked_min_num_sets(chunk_iterations, chunk_size = 2 ** 18, chunks_directory = None, workers = 1, dots_layout = None):
+    full_dominoes_counts, half_dominoes_counts, _, _ = get_chunked_dominoes_counts(chunk_iterations, chunk_size, chunks_directory, workers, dots_layout)
+    # the regions for white areas come after those for dots
+    num_dots = len(full_dominoes_counts) - num_sides_dots
+    dots_full_dominoes_counts, dots_half_dominoes_counts = get_dominoes_counts_tables(full_dominoes_counts[:num_dots].sum(axis = 0), half_dominoes_counts[:num_dots].sum(axis = 0))
+    white_areas_full_dominoes_counts, white_areas_half_dominoes_counts = get_dominoes_counts_tables(full_dominoes_counts[num_dots:].sum(axis = 0), half_dominoes_counts[num_dots:].sum(axis = 0))
+    return get_min_num_sets(dots_full_dominoes_counts, dots_half_dominoes_counts), get_min_num_sets(white_areas_full_dominoes_counts, white_areas_half_dominoes_counts)
+
+#####
+#### `print_chunked_min_num_sets()`
+#
+# > Given a number of iterations, print the minimum number of domino sets required for the dots and for the white areas, counting dominoes one chunk at a time.
+#####
+def print_chunked_min_num_sets(chunk_iterations, chunk_size = 2 ** 18, chunks_directory = None, workers = 1, dots_layout = None):
+    dots_min_num_sets, white_areas_min_num_sets = get_chunked_min_num_sets(chunk_iterations, chunk_size, chunks_directory, workers, dots_layout)
+    print('Minimum Number of Domino Sets to Cover All Dots (' + str(chunk_iterations) + ' iterations):')
+    print(dots_min_num_sets)
+    print('Minimum Number of Domino Sets to Cover All White Areas (' + str(chunk_iterations) + ' iterations):')
+    print(white_areas_min_num_sets)
+
+#####
+#### `get_train_chunks()`
+#
+# > Given a number of iterations, a chunk size, and region templates (see `get_region_templates()`), find the domino number and region of every square along the domino train, one chunk at a time.
+# >
+# > This yields the first square of each chunk, followed by arrays of the numbers (0 through 6) and the regions (as in `get_chunked_dominoes_counts()`) for the squares in the chunk.
+#####
+def get_train_chunks(chunk_iterations, chunk_size, region_templates):
+    total_num_squares = 4 ** chunk_iterations * num_sides_dots
+    for start in range(0, total_num_squares, chunk_size):
+        squares = np.arange(start, min(start + chunk_size, total_num_squares))
+        yield start, get_numbers(squares).astype(np.uint8), get_squares_regions(squares, chunk_iterations, region_templates).astype(np.int16)
+
+#####
+#### `get_train_numbers_and_regions()`
+#
+# > Given a number of iterations, find the domino number and region of every square along the domino train, one chunk at a time.
+# >
+# > This returns two arrays, indexed by global square: the numbers (0 through 6) and the regions (as in `get_chunked_dominoes_counts()`). They take 3 bytes per square, i.e. about 300 MB for 12 iterations, so the `export` command streams the chunks from `get_train_chunks()` instead.
+#####
+def get_train_numbers_and_regions(chunk_iterations, chunk_size = 2 ** 18, dots_layout = None):
+    if chunk_iterations < dots_iterations: raise ValueError('The dots are only defined for ' + str(dots_iterations) + ' or more iterations!')
+    if chunk_size < 1: raise ValueError('The chunk size must be at least 1!')
+    total_num_squares = 4 ** chunk_iterations * num_sides_dots
+    numbers = np.zeros(total_num_squares, dtype = np.uint8)
+    regions = np.zeros(total_num_squares, dtype = np.int16)
+    for start, chunk_numbers, chunk_regions in get_train_chunks(chunk_iterations, chunk_size, get_region_templates(dots_layout)):
+        numbers[start:start + len(chunk_numbers)] = chunk_numbers
+        regions[start:start + len(chunk_regions)] = chunk_regions
+    return numbers, regions
+
+
+#####
+### Running It All
+#
+# Running this file with no arguments runs every stage above and prints all of its tables, as well as rendering all of the diagrams.
+#
+# Alternatively, a command runs only the stages it needs and writes its result as JSON or as a compact binary (NumPy `.npz`) file, so scripts can use the results directly:
+# - `count`: the full and half domino counts for every dot and white area, and for every side
+# - `min-sets`: the minimum number of domino sets for the dots and for the white areas
+# - `export`: the domino number and region of every square along the domino train, streamed one chunk at a time (see `write_export_chunks()`)
+# - `render`: the Hilbert curve diagrams (the result lists the files written)
+# - `bench`: timings for the Hilbert curve kernel, the domino train product, and the chunked counts
+#
+# For example, `python metaphysics.py min-sets --iterations 8` writes `{"iterations": 8, "dots_min_num_sets": 1321, "white_areas_min_num_sets": 6711}`. Counts use the chunked pipeline, so they work for any number of iterations from `dots_iterations` up.
+#####
+
+#####
+#### `run_all()`
+#
+# > Run every stage, printing all of the tables and rendering all of the diagrams.
+#####
+def run_all():
+    # Start rendering first, so the diagrams are rendered while everything else runs.
+    [diagram_executor, diagram_futures] = render_diagrams()
+    print_values()
+    print_number_counts()
+    print_train_product()
+    print_squares(dot_1A, dots, dot_names)
+    print_dominoes_counts(dots, dot_names)
+    print_dominoes_counts(white_areas, white_area_names)
+    print_sides_dominoes_counts()
+    print_min_num_sets(dots)
+    print_min_num_sets(white_areas)
+    print_diagrams(diagram_executor, diagram_futures)
+
+#####
+#### `get_layout_names()`
+#
+# > Given a layout of dots (or `None` for the die's own), list the names of its regions: its dots followed by the white areas.
+#####
+def get_layout_names(dots_layout):
+    if dots_layout is None: dots_layout = get_layout()
+    return [dot[0] for dot in dots_layout] + white_area_names
+
+#####
+#### `get_count_result()`, `get_min_sets_result()`, `get_export_result()`, `get_render_result()`, and `get_bench_result()`
+#
+# > Given parsed command-line arguments and a layout of dots, run a command's stages and return its result, as a dictionary of names and values (numbers, lists, or arrays).
+#####
+def get_count_result(arguments, dots_layout):
+    full_dominoes_counts, half_dominoes_counts, sides_full_dominoes_counts, sides_half_dominoes_counts = get_chunked_dominoes_counts(
+        arguments.iterations, arguments.chunk_size, arguments.chunks_directory, arguments.workers, dots_layout)
+    # Full domino counts are indexed by region (or side), the larger number, and then the smaller number.
+    return {
+        'iterations': arguments.iterations,
+        'region_names': get_layout_names(dots_layout),
+        'full_dominoes_counts': full_dominoes_counts,
+        'half_dominoes_counts': half_dominoes_counts,
+        'side_names': side_names,
+        'sides_full_dominoes_counts': sides_full_dominoes_counts,
+        'sides_half_dominoes_counts': sides_half_dominoes_counts}
+
+def get_min_sets_result(arguments, dots_layout):
+    dots_min_num_sets, white_areas_min_num_sets = get_chunked_min_num_sets(
+        arguments.iterations, arguments.chunk_size, arguments.chunks_directory, arguments.workers, dots_layout)
+    return {'iterations': arguments.iterations, 'dots_min_num_sets': dots_min_num_sets, 'white_areas_min_num_sets': white_areas_min_num_sets}
+
+def get_export_result(arguments, dots_layout):
+    if arguments.iterations < dots_iterations: raise ValueError('The dots are only defined for ' + str(dots_iterations) + ' or more iterations!')
+    if arguments.chunk_size < 1: raise ValueError('The chunk size must be at least 1!')
+    # The numbers and regions are only found as they're written (see `write_export_result()`), so they're never all in memory at once.
+    return {
+        'iterations': arguments.iterations,
+        'region_names': get_layout_names(dots_layout),
+        'get_chunks': partial(get_train_chunks, arguments.iterations, arguments.chunk_size, get_region_templates(dots_layout))}
+
+def get_render_result(arguments, dots_layout):
+    if arguments.iterations < dots_iterations: raise ValueError('The dots are only defined for ' + str(dots_iterations) + ' or more iterations!')
+    if arguments.iterations > len(diagram_colors): raise ValueError('Hilbert curve diagrams can only be created for up to ' + str(len(diagram_colors)) + ' iterations!')
+    file_names = get_diagram_file_names(*render_diagrams(arguments.workers, arguments.iterations, dots_layout))
+    return {'iterations': arguments.iterations, 'file_names': file_names}
+
+def get_bench_result(arguments, dots_layout):
+    benchmark = get_hilbert_curve_kernel_benchmark(num_points = arguments.num_points)
+    result = {
+        'kernel_iterations': [row[0] for row in benchmark],
+        'kernel_num_points': arguments.num_points,
+        'kernel_decode_seconds': [row[2] for row in benchmark],
+        'package_decode_seconds': [row[3] for row in benchmark],
+        'kernel_encode_seconds': [row[4] for row in benchmark],
+        'package_encode_seconds': [row[5] for row in benchmark],
+        'iterations': arguments.iterations}
+    # each term covers 4 squares
+    num_terms = int(4 ** arguments.iterations * num_sides_dots / 4)
+    # so the tree is built again, and timed
+    cached_product_tree[:] = [0, None]
+    start_time = time.perf_counter()
+    get_partial_product(1, num_terms)
+    result['train_product_seconds'] = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    get_chunked_dominoes_counts(arguments.iterations, arguments.chunk_size, None, arguments.workers, dots_layout)
+    result['chunked_counts_seconds'] = time.perf_counter() - start_time
+    return result
+
+#####
+#### `write_result()`
+#
+# > Write a command's result, as JSON or as a binary NumPy `.npz` file, to the given file (or to standard output if it's `None`).
+#####
+def write_result(result, output_format, output_file_name):
+    if output_format == 'json':
+        # NumPy arrays and numbers aren't JSON serializable, but their tolist() methods give ones that are
+        output = (json.dumps(result, default = lambda value: value.tolist()) + '\n').encode()
+    else:
+        output_buffer = io.BytesIO()
+        np.savez(output_buffer, **result)
+        output = output_buffer.getvalue()
+    if output_file_name is None:
+        sys.stdout.buffer.write(output)
+        sys.stdout.buffer.flush()
+    else:
+        with open(output_file_name, 'wb') as output_file: output_file.write(output)
+
+#####
+#### `write_export_chunks()`
+#
+# > Write the result of the `export` command to an open (binary) file, streaming the numbers and regions one chunk at a time.
+# >
+# > As JSON, this writes JSON Lines: a first line with the number of iterations, the region names, and the number of squares, then a line for each chunk with its first square, numbers, and regions. As a binary NumPy `.npz` file, this writes the same arrays as `np.savez()` would.
+#####
+def write_export_chunks(result, output_format, output_file):
+    total_num_squares = 4 ** result['iterations'] * num_sides_dots
+    if output_format == 'json':
+        output_file.write((json.dumps({'iterations': result['iterations'], 'region_names': result['region_names'], 'num_squares': total_num_squares}) + '\n').encode())
+        for start, numbers, regions in result['get_chunks']():
+            output_file.write((json.dumps({'first_square': start, 'numbers': numbers.tolist(), 'regions': regions.tolist()}) + '\n').encode())
+        return
+    with zipfile.ZipFile(output_file, 'w', allowZip64 = True) as zip_file:
+        for name in ['iterations', 'region_names']:
+            with zip_file.open(name + '.npy', 'w') as array_file: np.lib.format.write_array(array_file, np.asarray(result[name]))
+        # one pass over the chunks for each array, since each is a separate file in the archive
+        for index, name, dtype in [[1, 'numbers', np.uint8], [2, 'regions', np.int16]]:
+            with zip_file.open(name + '.npy', 'w', force_zip64 = True) as array_file:
+                np.lib.format.write_array_header_1_0(array_file, {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)), 'fortran_order': False, 'shape': (total_num_squares,)})
+                for chunk in result['get_chunks']():
+                    array_file.write(chunk[index].tobytes())
+
+#####
+#### `write_export_result()`
+#
+# > Write the result of the `export` command (see `write_export_chunks()`) to the given file (or to standard output if it's `None`).
+#####
+def write_export_result(result, output_format, output_file_name):
+    if output_file_name is None:
+        write_export_chunks(result, output_format, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+    else:
+        with open(output_file_name, 'wb') as output_file: write_export_chunks(result, output_format, output_file)
+
+#####
+#### `get_argument_parser()`
+#
+# > Create the parser for command-line arguments, with a subparser for each command.
+#####
+def get_argument_parser():
+    # options shared by all commands
+    options_parser = argparse.ArgumentParser(add_help = False)
+    options_parser.add_argument('--iterations', type = int, default = iterations, help = 'iterations of the Hilbert curve on each side (default: %(default)s)')
+    options_parser.add_argument('--layout', help = 'JSON file with a layout of dots (default: the die\'s own)')
+    options_parser.add_argument('--workers', type = int, default = 1, help = 'number of worker processes (default: %(default)s)')
+    options_parser.add_argument('--format', choices = ['json', 'binary'], default = 'json', help = 'output format, binary being a NumPy .npz file (default: %(default)s)')
+    options_parser.add_argument('--output', help = 'file to write the output to (default: standard output)')
+    options_parser.add_argument('--chunk-size', type = int, default = 2 ** 18, help = 'squares per chunk (default: %(default)s)')
+    options_parser.add_argument('--chunks-directory', help = 'directory to save the counts for each chunk in, so an interrupted run can be resumed')
+    # all commands but 'export' write their whole result at once
+    options_parser.set_defaults(write_result = write_result)
+    parser = argparse.ArgumentParser(description = 'Calculations for the die of dominoes in Metaphysics. With no command, run every stage and print all of the tables.')
+    subparsers = parser.add_subparsers(dest = 'command')
+    subparsers.add_parser('count', parents = [options_parser], help = 'full and half domino counts for every region and side').set_defaults(get_result = get_count_result)
+    subparsers.add_parser('min-sets', parents = [options_parser], help = 'minimum number of domino sets for the dots and white areas').set_defaults(get_result = get_min_sets_result)
+    subparsers.add_parser('export', parents = [options_parser], help = 'domino number and region of every square').set_defaults(get_result = get_export_result, write_result = write_export_result)
+    subparsers.add_parser('render', parents = [options_parser], help = 'render the Hilbert curve diagrams').set_defaults(get_result = get_render_result)
+    bench_parser = subparsers.add_parser('bench', parents = [options_parser], help = 'time the Hilbert curve kernel, domino train product, and chunked counts')
+    bench_parser.add_argument('--num-points', type = int, default = 100000, help = 'points for the Hilbert curve kernel benchmark (default: %(default)s)')
+    bench_parser.set_defaults(get_result = get_bench_result)
+    return parser
+
+#####
+#### `main()`
+#
+# > Run the command given by the command-line arguments, or every stage if there's no command.
+#####
+def main(argv = None):
+    parser = get_argument_parser()
+    arguments = parser.parse_args(argv)
+    if arguments.command is None:
+        run_all()
+        return
+    try:
+        dots_layout = None
+        if arguments.layout is not None: dots_layout = load_layout(arguments.layout)
+        result = arguments.get_result(arguments, dots_layout)
+    except (ValueError, OSError, ImportError) as error:
+        parser.error(str(error))
+    arguments.write_result(result, arguments.format, arguments.output)
+
+# The worker processes may import this file, so the stages only run when it's run directly.
+if __name__ == '__main__':
+    main()
 
 
 